@@ -1,133 +1,252 @@
 import requests
 import json
 import os
-from typing import Dict, List, Any, Optional
+import heapq
+import math
+import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, List, Any, Optional, Tuple, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# 磁盘缓存有效期（秒）
+TRENDING_CACHE_TTL = 3600
+DETAILS_CACHE_TTL = 86400
+MDBLIST_CACHE_TTL = 21600  # 评分变化较快，缓存时间短一些
+
+# 请求默认超时（连接, 读取），连不上的主机尽快失败
+TimeoutSpec = Union[float, Tuple[float, float]]
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# 服务端 Retry-After 的最长等待（秒）；配额耗尽时可能要求等待数小时，不能照单全收
+RETRY_AFTER_MAX = 5
+
+# mdblist 中视为无效的评分值
+INVALID_RATING_VALUES = frozenset({None, '', 0, '0', 'N/A', 'NA', 'tbd'})
+
+# 只保留的主要评分源
+MAIN_RATING_SOURCES = frozenset({'imdb', 'trakt', 'metacritic', 'tomatoes', 'popcorn', 'tmdb', 'letterboxd'})
+
+def _image_size_key(img: Dict[str, Any]):
+    """图片排序键：width 优先，其次 vote_average"""
+    return (img.get("width", 0), img.get("vote_average", 0))
+
+def _image_vote_key(img: Dict[str, Any]):
+    """图片排序键：vote_average"""
+    return img.get("vote_average", 0)
+
+class CappedRetry(Retry):
+    """遵循 Retry-After，但等待时间不超过 RETRY_AFTER_MAX"""
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, RETRY_AFTER_MAX)
 
 class MovieDataFetcher:
-    def __init__(self, api_key: str, mdblist_api_key: str):
+    def __init__(self, api_key: str, mdblist_api_key: str, max_workers: int = 16, cache_dir: Optional[str] = None,
+                 timeout: TimeoutSpec = DEFAULT_TIMEOUT):
         self.api_key = api_key
         self.mdblist_api_key = mdblist_api_key
         self.base_url = "https://api.themoviedb.org/3"
         self.mdblist_base_url = "https://api.mdblist.com/tmdb"
         self.session = requests.Session()
-    
-    def get_trending_data(self, time_window: str = 'week') -> Dict[str, Any]:
-        """获取热门趋势数据"""
-        url = f"{self.base_url}/trending/all/{time_window}"
-        params = {
-            'api_key': self.api_key,
-            'language': 'zh'
+        # 加大连接池，让并发请求复用 keep-alive 连接；
+        # 对限流和 5xx 指数退避重试（Retry-After 等待有上限），单次运行内消化瞬时错误
+        retry = CappedRetry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+        self.session.mount('https://', adapter)
+        # mdblist 有每日配额，限流时多半是配额耗尽，少重试几次
+        mdblist_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32, max_retries=retry.new(total=2))
+        self.session.mount(self.mdblist_base_url, mdblist_adapter)
+        # Accept-Encoding 使用 requests 默认值（gzip/deflate，安装 brotli 时自动加上 br）
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'User-Agent': 'vidora-data/1.0'
+        })
+        # 请求的固定参数，只构建一次
+        self.base_params = {'api_key': api_key, 'language': 'zh'}
+        self.mdblist_params = {'apikey': mdblist_api_key}
+        # 电影/电视剧详情请求的固定参数
+        self.detail_params = self.base_params | {
+            'append_to_response': 'images',  # credits/videos 未被使用，不再请求
+            'include_image_language': 'zh,en,null'
+        }
+        # 按媒体类型分发详情请求
+        self.detail_fetchers = {
+            'movie': self.get_movie_details,
+            'tv': self.get_tv_details
         }
+        self.max_workers = max_workers  # 并发请求的线程数
+        self.cache_dir = cache_dir  # 为空时不使用磁盘缓存
+        self.timeout = timeout  # 未单独指定超时的请求使用的默认超时，避免单个请求卡住整次运行
+        self.memory_cache = {}  # 单次运行内的响应缓存，同一条目在多个分区出现时只请求一次
+    
+    def _read_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取磁盘缓存条目 {'etag', 'data', 'age'}，未命中返回 None"""
+        if not self.cache_dir:
+            return None
+        
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            age = time.time() - os.path.getmtime(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if not isinstance(entry, dict) or 'data' not in entry:
+            return None
+        
+        entry['age'] = age
+        return entry
+    
+    def _write_cache(self, key: str, data: Dict[str, Any], etag: Optional[str] = None):
+        """写入磁盘缓存（先写临时文件再替换，避免并发读到半个文件）"""
+        if not self.cache_dir or not data:
+            return
+        
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'etag': etag, 'data': data}, ensure_ascii=False, separators=(',', ':')))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("写入缓存 %s 失败: %s", key, e)
+    
+    def _touch_cache(self, key: str):
+        """把缓存文件的 mtime 更新为当前时间，无需重新写入内容"""
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            os.utime(path)
+        except OSError as e:
+            logger.warning("刷新缓存 %s 失败: %s", key, e)
+    
+    def _decode_json(self, response: requests.Response) -> Dict[str, Any]:
+        """
+        直接从响应字节解析 JSON（接口均为 UTF-8），跳过 response.text 的编码探测和解码
+        解析失败时抛出 requests.RequestException 的子类，与 response.json() 保持一致
+        """
+        try:
+            return json.loads(response.content)
+        except ValueError as e:
+            raise requests.exceptions.InvalidJSONError(str(e), response=response)
+    
+    def _get_json(self, url: str, params: Dict[str, Any], timeout: Optional[TimeoutSpec] = None) -> Dict[str, Any]:
+        """发起 GET 请求并解析 JSON，失败时抛出 requests.RequestException"""
+        response = self.session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return self._decode_json(response)
+    
+    def _cached_get(self, cache_key: str, ttl: int, url: str, params: Dict[str, Any],
+                    timeout: Optional[TimeoutSpec] = None) -> Dict[str, Any]:
+        """
+        带磁盘缓存的 GET 请求
+        缓存未过期时直接返回；过期后带 ETag 发起条件请求，304 时沿用缓存；
+        请求失败时退回过期缓存，没有缓存则抛出 requests.RequestException
+        """
+        entry = self._read_cache(cache_key)
+        if entry and entry['age'] <= ttl:
+            return entry['data']
+        
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
         
         try:
-            response = self.session.get(url, params=params)
+            response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            if response.status_code == 304 and entry:
+                # 内容未变化，刷新缓存时间即可（缓存年龄取自文件 mtime）
+                self._touch_cache(cache_key)
+                return entry['data']
             response.raise_for_status()
-            return response.json()
+            data = self._decode_json(response)
         except requests.RequestException as e:
-            print(f"获取趋势数据失败: {e}")
-            return {}
+            if entry:
+                logger.warning("请求失败，使用过期缓存 %s: %s", cache_key, e)
+                return entry['data']
+            raise
+        
+        self._write_cache(cache_key, data, response.headers.get('ETag'))
+        return data
     
-    def get_popular_movies(self, page: int = 1) -> Dict[str, Any]:
-        """获取热门电影"""
-        url = f"{self.base_url}/movie/popular"
-        params = {
-            'api_key': self.api_key,
-            'language': 'zh',
-            'page': page
-        }
+    def _safe_get(self, url: str, params: Dict[str, Any], context: str = '', cache_key: Optional[str] = None,
+                  ttl: int = 0, timeout: Optional[TimeoutSpec] = None) -> Dict[str, Any]:
+        """
+        所有接口请求的统一入口，请求失败时返回空字典
+        指定 cache_key 时先查内存缓存，再走磁盘缓存；context 为空时不输出错误日志
+        """
+        if timeout is None:
+            timeout = self.timeout
         
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
+            if cache_key:
+                data = self.memory_cache.get(cache_key)
+                if data is None:
+                    data = self._cached_get(cache_key, ttl, url, params, timeout=timeout)
+                    self.memory_cache[cache_key] = data
+                return data
+            return self._get_json(url, params, timeout=timeout)
         except requests.RequestException as e:
-            print(f"获取热门电影失败: {e}")
+            if context:
+                logger.error("%s失败: %s", context, e)
             return {}
     
+    def get_trending_data(self, time_window: str = 'week') -> Dict[str, Any]:
+        """获取热门趋势数据"""
+        url = f"{self.base_url}/trending/all/{time_window}"
+        return self._safe_get(url, self.base_params, "获取趋势数据",
+                              cache_key=f"trending_{time_window}", ttl=TRENDING_CACHE_TTL)
+    
+    def get_popular_movies(self, page: int = 1) -> Dict[str, Any]:
+        """获取热门电影"""
+        url = f"{self.base_url}/movie/popular"
+        return self._safe_get(url, self.base_params | {'page': page}, "获取热门电影")
+    
     def get_popular_tv(self, page: int = 1) -> Dict[str, Any]:
         """获取热门电视剧"""
         url = f"{self.base_url}/tv/popular"
-        params = {
-            'api_key': self.api_key,
-            'language': 'zh',
-            'page': page
-        }
-        
-        try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"获取热门电视剧失败: {e}")
-            return {}
+        return self._safe_get(url, self.base_params | {'page': page}, "获取热门电视剧")
     
     def get_movie_details(self, movie_id: int) -> Dict[str, Any]:
         """获取电影详细信息"""
         url = f"{self.base_url}/movie/{movie_id}"
-        params = {
-            'api_key': self.api_key,
-            'language': 'zh',
-            'append_to_response': 'credits,videos,images',
-            'include_image_language': 'zh,en,null'
-        }
-        
-        try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"获取电影 {movie_id} 详细信息失败: {e}")
-            return {}
+        return self._safe_get(url, self.detail_params, f"获取电影 {movie_id} 详细信息",
+                              cache_key=f"movie_{movie_id}", ttl=DETAILS_CACHE_TTL)
     
     def get_tv_details(self, tv_id: int) -> Dict[str, Any]:
         """获取电视剧详细信息"""
         url = f"{self.base_url}/tv/{tv_id}"
-        params = {
-            'api_key': self.api_key,
-            'language': 'zh',
-            'append_to_response': 'images',
-            'include_image_language': 'zh,en,null'
-        }
-        
-        try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"获取电视剧 {tv_id} 详细信息失败: {e}")
-            return {}
+        return self._safe_get(url, self.detail_params, f"获取电视剧 {tv_id} 详细信息",
+                              cache_key=f"tv_{tv_id}", ttl=DETAILS_CACHE_TTL)
     
     def get_mdblist_data(self, media_type: str, tmdb_id: int) -> Optional[Dict[str, Any]]:
-        """从 mdblist API 获取额外数据"""
+        """从 mdblist API 获取额外数据，失败时返回 None（不输出错误日志）"""
         mdb_media_type = 'show' if media_type == 'tv' else 'movie'
         
         url = f"{self.mdblist_base_url}/{mdb_media_type}/{tmdb_id}"
-        params = {'apikey': self.mdblist_api_key}
-        
-        try:
-            response = self.session.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException:
-            return None
+        return self._safe_get(url, self.mdblist_params, cache_key=f"mdblist_{mdb_media_type}_{tmdb_id}",
+                              ttl=MDBLIST_CACHE_TTL, timeout=5) or None
     
-    def filter_valid_ratings(self, ratings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """过滤评分数据，移除 value 为 null 的评分"""
-        if not ratings:
-            return []
-        
-        valid_ratings = []
-        for rating in ratings:
-            value = rating.get('value')
-            if value is not None and value != '' and value != 0:
-                valid_ratings.append(rating)
-        
-        return valid_ratings
-
     def filter_images(self, images: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
         if not images:
             return images
     
+        # 详情数据可能来自内存缓存并被多个分区共用，复制一层再修改
+        images = dict(images)
         per_language_limit = 2  # 每种语言最多返回 2 条
     
         for key in ("backdrops", "posters", "logos"):
@@ -141,134 +260,154 @@ class MovieDataFetcher:
             }
     
             for img in raw:
-                lang = img.get("iso_639_1")
-                if lang in grouped_by_lang:
-                    grouped_by_lang[lang].append(img)
+                bucket = grouped_by_lang.get(img.get("iso_639_1"))
+                if bucket is not None:
+                    bucket.append(img)
     
-            # 每种语言按 width 和 vote_average 排序，取前 per_language_limit 条
+            # 每种语言按 width 和 vote_average 取前 per_language_limit 条
+            # 只需要 top-k，用 heapq.nlargest 代替整体排序（同值时顺序与 sorted 一致）
             filtered = []
             for lang, lang_images in grouped_by_lang.items():
-                # 按 width 倒序排序，再按 vote_average 倒序排序
-                sorted_lang = sorted(
-                    lang_images,
-                    key=lambda img: (-img.get("width", 0), -img.get("vote_average", 0))
-                )
-                filtered.extend(sorted_lang[:per_language_limit])  # 每种语言最多返回 per_language_limit 张图片
-    
-            # 合并后的结果按 vote_average 倒序排序，取前 6 条图片
-            images[key] = sorted(
-                filtered,
-                key=lambda img: -img.get("vote_average", 0)
-            )[:6]  # 每个分类最多返回 6 张图片
+                # 按 width 倒序，再按 vote_average 倒序
+                filtered.extend(
+                    heapq.nlargest(per_language_limit, lang_images, key=_image_size_key)
+                )  # 每种语言最多返回 per_language_limit 张图片
+    
+            # 合并后的结果按 vote_average 倒序，取前 6 条图片
+            images[key] = heapq.nlargest(6, filtered, key=_image_vote_key)  # 每个分类最多返回 6 张图片
     
         return images
     
-    def compress_item_data(self, item: Dict[str, Any], details: Dict[str, Any] = None, media_type: str = None) -> Dict[str, Any]:
+    def _base_fields(self, item: Dict[str, Any], media_type: str) -> Dict[str, Any]:
+        """列表项中的基础字段"""
+        # 热路径上反复调用的方法先绑定到局部变量
+        item_get = item.get
+        overview = item_get('overview')
+        
+        return {
+            'id': item_get('id'),
+            'media_type': media_type,
+            'title': item_get('title') or item_get('name'),
+            'original_title': item_get('original_title') or item_get('original_name'),
+            'poster_path': item_get('poster_path'),
+            'backdrop_path': item_get('backdrop_path'),
+            'overview': overview[:2000] if overview else '',  # 适当限制简介长度
+            'vote_average': round(item_get('vote_average', 0), 1),
+            'vote_count': item_get('vote_count', 0),
+            'popularity': round(item_get('popularity', 0), 1),
+            'release_date': item_get('release_date') or item_get('first_air_date'),
+            'genre_ids': item_get('genre_ids', []),
+            'adult': item_get('adult', False),
+            'original_language': item_get('original_language')
+        }
+    
+    def _detail_fields(self, details: Dict[str, Any], media_type: str) -> Dict[str, Any]:
+        """详情接口中的补充字段"""
+        details_get = details.get
+        
+        # 通用详细字段
+        fields = {
+            'budget': details_get('budget'),
+            'revenue': details_get('revenue'),
+            'runtime': details_get('runtime'),
+            'status': details_get('status'),
+            'tagline': details_get('tagline'),
+            'homepage': details_get('homepage'),
+            'imdb_id': details_get('imdb_id'),
+            'spoken_languages': details_get('spoken_languages', []),
+            'production_companies': details_get('production_companies', [])[:5],
+            'production_countries': details_get('production_countries', []),
+            'genres': details_get('genres', [])
+        }
+        
+        # 电视剧特有字段
+        if media_type == 'tv':
+            fields |= {
+                'first_air_date': details_get('first_air_date'),
+                'last_air_date': details_get('last_air_date'),
+                'number_of_episodes': details_get('number_of_episodes'),
+                'number_of_seasons': details_get('number_of_seasons'),
+                'episode_run_time': details_get('episode_run_time', []),
+                'in_production': details_get('in_production'),
+                'networks': details_get('networks', [])[:5],
+                'origin_country': details_get('origin_country', []),
+                'type': details_get('type')
+            }
+        
+        # 电影特有字段
+        elif media_type == 'movie':
+            fields['belongs_to_collection'] = details_get('belongs_to_collection')
+
+        # 图片信息 - 使用新的过滤和排序逻辑
+        if 'images' in details:
+            fields['images'] = self.filter_images(details["images"])
+        
+        return fields
+    
+    def _mdblist_fields(self, mdb_data: Dict[str, Any]) -> Dict[str, Any]:
+        """mdblist 数据中的评分等字段（只保留主要评分源）"""
+        fields = {}
+        
+        # 压缩评分数据 - 只保留主要评分源
+        # 过滤无效值和筛选评分源合并为一次遍历
+        main_ratings = {}
+        for rating in mdb_data.get('ratings') or ():
+            source = rating.get('source')
+            value = rating.get('value')
+            if source not in MAIN_RATING_SOURCES:
+                continue
+            # 常见占位值直接跳过；其余无法转成有限数字的值（'unrated'、列表、NaN 等）也跳过，不能让整个分区失败
+            try:
+                if value in INVALID_RATING_VALUES:
+                    continue
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(value):
+                main_ratings[source] = round(value, 1)
+        
+        if main_ratings:
+            fields['rating'] = main_ratings
+        
+        # 其他重要的 mdblist 数据
+        if mdb_data.get('certification'):
+            fields['certification'] = mdb_data['certification']
+        if mdb_data.get('age_rating'):
+            fields['age_rating'] = mdb_data['age_rating']
+        if mdb_data.get('trailer'):
+            fields['trailer'] = mdb_data['trailer']
+        
+        return fields
+    
+    def compress_item_data(self, item: Dict[str, Any], details: Dict[str, Any] = None, media_type: str = None,
+                           mdb_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         压缩单个项目数据，保留重要字段
+        mdb_data 为预先获取的 mdblist 数据，本方法不发起网络请求
         """
         # 确定媒体类型
         if not media_type:
             media_type = item.get('media_type', 'movie')
         
         # 基础字段（必需）
-        compressed = {
-            'id': item.get('id'),
-            'media_type': media_type,
-            'title': item.get('title') or item.get('name'),
-            'original_title': item.get('original_title') or item.get('original_name'),
-            'poster_path': item.get('poster_path'),
-            'backdrop_path': item.get('backdrop_path'),
-            'overview': item.get('overview', '')[:2000] if item.get('overview') else '',  # 适当限制简介长度
-            'vote_average': round(item.get('vote_average', 0), 1),
-            'vote_count': item.get('vote_count', 0),
-            'popularity': round(item.get('popularity', 0), 1),
-            'release_date': item.get('release_date') or item.get('first_air_date'),
-            'genre_ids': item.get('genre_ids', []),
-            'adult': item.get('adult', False),
-            'original_language': item.get('original_language')
-        }
+        compressed = self._base_fields(item, media_type)
         
         # 如果有详细信息，添加更多字段
         if details:
-            # 通用详细字段
-            detail_fields = {
-                'budget': details.get('budget'),
-                'revenue': details.get('revenue'),
-                'runtime': details.get('runtime'),
-                'status': details.get('status'),
-                'tagline': details.get('tagline'),
-                'homepage': details.get('homepage'),
-                'imdb_id': details.get('imdb_id'),
-                'spoken_languages': details.get('spoken_languages', []),
-                'production_companies': details.get('production_companies', [])[:5],
-                'production_countries': details.get('production_countries', []),
-                'genres': details.get('genres', [])
-            }
-            
-            # 电视剧特有字段
-            if media_type == 'tv':
-                tv_fields = {
-                    'first_air_date': details.get('first_air_date'),
-                    'last_air_date': details.get('last_air_date'),
-                    'number_of_episodes': details.get('number_of_episodes'),
-                    'number_of_seasons': details.get('number_of_seasons'),
-                    'episode_run_time': details.get('episode_run_time', []),
-                    'in_production': details.get('in_production'),
-                    'networks': details.get('networks', [])[:5],
-                    'origin_country': details.get('origin_country', []),
-                    'type': details.get('type')
-                }
-                detail_fields.update(tv_fields)
-            
-            # 电影特有字段
-            elif media_type == 'movie':
-                movie_fields = {
-                    'belongs_to_collection': details.get('belongs_to_collection')
-                }
-                detail_fields.update(movie_fields)
-
-            # 图片信息 - 使用新的过滤和排序逻辑
-            if 'images' in details:
-                detail_fields['images'] = self.filter_images(details["images"])
-            
-            # 只添加有值的详细字段
-            for key, value in detail_fields.items():
-                if value is not None and value != '' and value != []:
-                    compressed[key] = value
+            compressed |= self._detail_fields(details, media_type)
         
-        # 获取并压缩 mdblist 数据（只保留主要评分源）
-        mdb_data = self.get_mdblist_data(media_type, item.get('id'))
         if mdb_data:
-            # 压缩评分数据 - 只保留主要评分源
-            if 'ratings' in mdb_data and mdb_data['ratings']:
-                valid_ratings = self.filter_valid_ratings(mdb_data['ratings'])
-                if valid_ratings:
-                    # 只保留主要评分源
-                    main_sources = ['imdb', "trakt", 'metacritic', "tomatoes", 'popcorn', "tmdb", 'letterboxd']
-                    main_ratings = {}
-                    
-                    for rating in valid_ratings:
-                        source = rating.get('source')
-                        value = rating.get('value')
-                        if source in main_sources and value is not None:
-                            main_ratings[source] = round(float(value), 1)
-                    
-                    if main_ratings:
-                        compressed['rating'] = main_ratings
-            
-            # 其他重要的 mdblist 数据
-            if mdb_data.get('certification'):
-                compressed['certification'] = mdb_data['certification']
-            if mdb_data.get('age_rating'):
-                compressed['age_rating'] = mdb_data['age_rating']
-            if mdb_data.get('trailer'):
-                compressed['trailer'] = mdb_data['trailer']
+            compressed |= self._mdblist_fields(mdb_data)
         
-        # 移除空值
-        return {k: v for k, v in compressed.items() if v is not None and v != '' and v != []}
+        # 移除空值（原地删除，不再复制整个字典；0 和 False 是有效值，需保留）
+        empty_keys = [k for k, v in compressed.items() if v is None or v == '' or v == []]
+        for k in empty_keys:
+            del compressed[k]
 
-    def process_data_list(self, data: Dict[str, Any], media_type: str = None, limit: int = 20, fetch_details: bool = True) -> List[Dict[str, Any]]:
+        return compressed
+
+    def process_data_list(self, data: Dict[str, Any], media_type: str = None, limit: int = 20, fetch_details: bool = True,
+                          fetch_mdblist: bool = True) -> List[Dict[str, Any]]:
         """处理数据列表，返回压缩后的数据，过滤掉没有overview的项目"""
         if 'results' not in data:
             return []
@@ -276,40 +415,47 @@ class MovieDataFetcher:
         processed_items = []
         items = data['results']
         
-        # 先过滤掉没有overview的项目
-        filtered_items = []
-        for item in items:
-            overview = item.get('overview', '').strip()
-            if overview:  # 只保留有overview且不为空的项目
-                filtered_items.append(item)
-        
-        print(f"  📋 原始数据: {len(items)} 个项目")
-        print(f"  ✅ 过滤后: {len(filtered_items)} 个项目 (移除了 {len(items) - len(filtered_items)} 个无简介项目)")
+        # 过滤掉没有overview的项目，凑满 limit 个即停止，不再扫描剩余项目
+        filtered_items = list(islice(
+            (item for item in items if (item.get('overview') or '').strip()),
+            limit
+        ))
+        total = len(filtered_items)
         
-        # 限制数量
-        filtered_items = filtered_items[:limit]
+        logger.info("  📋 原始数据: %d 个项目", len(items))
+        logger.info("  ✅ 过滤后: 保留 %d 个有简介的项目", total)
         
-        for i, item in enumerate(filtered_items, 1):
-            # 确定媒体类型
-            item_media_type = media_type or item.get('media_type', 'movie')
-            item_id = item.get('id')
-            item_title = item.get('title') or item.get('name', 'Unknown')
-            
-            print(f"  处理 {i}/{len(filtered_items)}: {item_title} (ID: {item_id})")
-            
-            # 获取详细信息
-            details = None
-            if fetch_details and item_id:
-                if item_media_type == 'movie':
-                    details = self.get_movie_details(item_id)
-                elif item_media_type == 'tv':
-                    details = self.get_tv_details(item_id)
-            
-            # 压缩数据
-            compressed_item = self.compress_item_data(item, details, item_media_type)
+        # 各项目的详情和 mdblist 请求互不依赖，全部提交到线程池并发获取
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            jobs = []
+            for item in filtered_items:
+                # 确定媒体类型
+                item_media_type = media_type or item.get('media_type', 'movie')
+                item_id = item.get('id')
+                
+                # 获取详细信息；没有 ID 的项目无法查询，不发起任何请求
+                details_future = None
+                mdb_future = None
+                if item_id:
+                    if fetch_details:
+                        fetch = self.detail_fetchers.get(item_media_type)
+                        if fetch:
+                            details_future = executor.submit(fetch, item_id)
+                    
+                    if fetch_mdblist:
+                        mdb_future = executor.submit(self.get_mdblist_data, item_media_type, item_id)
+                jobs.append((item, item_media_type, details_future, mdb_future))
             
-            if compressed_item:
-                processed_items.append(compressed_item)
+            # 按原始顺序等待结果并压缩数据
+            for i, (item, item_media_type, details_future, mdb_future) in enumerate(jobs, 1):
+                item_title = item.get('title') or item.get('name', 'Unknown')
+                logger.info("  处理 %d/%d: %s (ID: %s)", i, total, item_title, item.get('id'))
+                
+                details = details_future.result() if details_future else None
+                mdb_data = mdb_future.result() if mdb_future else None
+                compressed_item = self.compress_item_data(item, details, item_media_type, mdb_data)
+                if compressed_item:
+                    processed_items.append(compressed_item)
                 
         return processed_items
     
@@ -317,72 +463,103 @@ class MovieDataFetcher:
         """生成主页数据"""
         homepage_data = {}
         
-        # 数据源配置 (key, name, fetch_func, media_type, limit, fetch_details)
+        # 数据源配置 (key, name, fetch_func, media_type, limit, fetch_details, fetch_mdblist)
         data_sources = [
-            ('trending', '趋势数据', lambda: self.get_trending_data('week'), None, 15, True),
-            # ('popularMovie', '热门电影', lambda: self.get_popular_movies(), 'movie', 20, True),
-            # ('popularTv', '热门电视剧', lambda: self.get_popular_tv(), 'tv', 20, True),
+            ('trending', '趋势数据', lambda: self.get_trending_data('week'), None, 15, True, True),
+            # ('popularMovie', '热门电影', lambda: self.get_popular_movies(), 'movie', 20, True, True),
+            # ('popularTv', '热门电视剧', lambda: self.get_popular_tv(), 'tv', 20, True, True),
         ]
         
-        for key, name, fetch_func, media_type, limit, fetch_details in data_sources:
-            print(f"📥 获取{name}...")
+        # 各分区的列表请求互不依赖，先全部并发发出，再按顺序逐个处理
+        # 所有分区都被注释掉时 data_sources 为空，线程数至少为 1
+        with ThreadPoolExecutor(max_workers=max(1, len(data_sources))) as executor:
+            list_futures = []
+            for source in data_sources:
+                logger.info("📥 获取%s...", source[1])
+                list_futures.append(executor.submit(source[2]))
+        
+        for (key, name, _, media_type, limit, fetch_details, fetch_mdblist), list_future in zip(data_sources, list_futures):
             try:
-                raw_data = fetch_func()
+                raw_data = list_future.result()
                 if raw_data:
-                    processed_data = self.process_data_list(raw_data, media_type, limit, fetch_details)
+                    processed_data = self.process_data_list(raw_data, media_type, limit, fetch_details, fetch_mdblist)
                     homepage_data[key] = processed_data
-                    print(f"✅ {name}: {len(processed_data)} 个项目")
+                    logger.info("✅ %s: %d 个项目", name, len(processed_data))
                 else:
                     homepage_data[key] = []
-                    print(f"❌ {name}: 获取失败")
+                    logger.error("❌ %s: 获取失败", name)
             except Exception as e:
-                print(f"❌ {name} 处理失败: {e}")
+                logger.error("❌ %s 处理失败: %s", name, e)
                 homepage_data[key] = []
             
-            print("-" * 40)
+            logger.info("-" * 40)
         
         return homepage_data
     
-    def save_to_file(self, data: Dict[str, List[Dict[str, Any]]], filename: str = 'homepage.json'):
-        """保存数据到文件（压缩格式）"""
+    def save_to_file(self, data: Dict[str, List[Dict[str, Any]]], filename: str = 'homepage.json',
+                     debug: bool = False):
+        """保存数据到文件（压缩格式），debug 为 True 时额外输出带缩进的调试版本"""
+        tmp_filename = filename + '.tmp'
         try:
-            # 保存压缩版本（无缩进，无空格）
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            # 整体序列化为紧凑格式后一次性写入临时文件，再 os.replace，避免留下半截文件
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+            os.replace(tmp_filename, filename)
 
-            # 保存一个可读版本用于调试（可选）
-            debug_filename = filename.replace('.json', '_debug.json')
-            with open(debug_filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 可读版本仅用于本地调试，CI 不需要，默认不生成
+            if debug:
+                debug_filename = filename.replace('.json', '_debug.json')
+                with open(debug_filename, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps(data, ensure_ascii=False, indent=2))
             
         except Exception as e:
-            print(f"❌ 保存文件失败: {e}")
+            logger.error("❌ 保存文件失败: %s", e)
+            # 清理临时文件，免得工作流把它当作改动
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
 
 def main():
+    # 默认只输出警告和错误；VIDORA_VERBOSE=1 时输出逐项进度
+    verbose = os.getenv('VIDORA_VERBOSE') == '1'
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING, format='%(message)s')
+    
     # 从环境变量获取 API 密钥
     tmdb_api_key = os.getenv('TMDB_API_KEY', '')
     mdblist_api_key = os.getenv('MDBLIST_API_KEY', '')
     
     if not tmdb_api_key:
-        print("❌ 错误: 未找到 TMDB API 密钥")
+        logger.error("❌ 错误: 未找到 TMDB API 密钥")
         return
     
     if not mdblist_api_key:
-        print("❌ 错误: 未找到 MDBLIST API 密钥")
+        logger.error("❌ 错误: 未找到 MDBLIST API 密钥")
+        return
+    
+    # 设置 VIDORA_CACHE_DIR 后启用磁盘缓存，便于本地反复调试
+    cache_dir = os.getenv('VIDORA_CACHE_DIR') or None
+    
+    # VIDORA_MAX_WORKERS 可调整并发请求数（默认 16）
+    try:
+        max_workers = max(1, int(os.getenv('VIDORA_MAX_WORKERS', '16')))
+    except ValueError:
+        logger.error("❌ 错误: VIDORA_MAX_WORKERS 必须是整数")
         return
     
-    fetcher = MovieDataFetcher(tmdb_api_key, mdblist_api_key)
+    fetcher = MovieDataFetcher(tmdb_api_key, mdblist_api_key, max_workers=max_workers, cache_dir=cache_dir)
     
-    print("🎬 开始生成主页数据...")
-    print("=" * 60)
+    logger.info("🎬 开始生成主页数据...")
+    logger.info("=" * 60)
     
     homepage_data = fetcher.generate_homepage_data()
     
     if homepage_data:
-        fetcher.save_to_file(homepage_data)
-        print("🎉 任务完成!")
+        # VIDORA_DEBUG_JSON=1 时额外生成 homepage_debug.json
+        fetcher.save_to_file(homepage_data, debug=os.getenv('VIDORA_DEBUG_JSON') == '1')
+        logger.info("🎉 任务完成!")
     else:
-        print("❌ 生成数据失败")
+        logger.error("❌ 生成数据失败")
 
 if __name__ == "__main__":
     main()